@@ -1,1034 +1,1304 @@
-import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
-from datetime import datetime, date
-import pandas as pd
-from fpdf import FPDF
-import io
-import time
-
-# ---------------------------------------------------------------------------
-# 1. Authentication & Google Sheets connection
-# ---------------------------------------------------------------------------
-
-SCOPES = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive",
-]
-
-
-@st.cache_resource
-def get_gspread_client():
-    creds_info = dict(st.secrets["gcp_service_account"])
-    creds = Credentials.from_service_account_info(creds_info, scopes=SCOPES)
-    return gspread.authorize(creds)
-
-
-@st.cache_resource
-def get_workbook():
-    client = get_gspread_client()
-    return client.open_by_key(st.secrets["sheets"]["sheet_id"])
-
-
-# ---------------------------------------------------------------------------
-# 2. Sheet helpers — with batch writes & retry
-# ---------------------------------------------------------------------------
-
-
-def append_row(worksheet_name: str, row_data: list, retries: int = 2):
-    for attempt in range(retries + 1):
-        try:
-            wb = get_workbook()
-            ws = wb.worksheet(worksheet_name)
-            ws.append_row(row_data, value_input_option="USER_ENTERED")
-            return True
-        except gspread.exceptions.APIError as e:
-            if attempt < retries and "RATE_LIMIT" in str(e):
-                time.sleep(2)
-                continue
-            st.error(f"Error writing to {worksheet_name}: {e}")
-            return False
-        except Exception as e:
-            st.error(f"Error writing to {worksheet_name}: {e}")
-            return False
-
-
-def append_rows_batch(worksheet_name: str, rows: list[list], retries: int = 2):
-    """Batch-append multiple rows in a single API call (much faster)."""
-    for attempt in range(retries + 1):
-        try:
-            wb = get_workbook()
-            ws = wb.worksheet(worksheet_name)
-            ws.append_rows(rows, value_input_option="USER_ENTERED")
-            return True
-        except gspread.exceptions.APIError as e:
-            if attempt < retries and "RATE_LIMIT" in str(e):
-                time.sleep(2)
-                continue
-            st.error(f"Error writing to {worksheet_name}: {e}")
-            return False
-        except Exception as e:
-            st.error(f"Error writing to {worksheet_name}: {e}")
-            return False
-
-
-@st.cache_data(ttl=120)
-def read_all_rows(worksheet_name: str) -> list[dict]:
-    try:
-        wb = get_workbook()
-        ws = wb.worksheet(worksheet_name)
-        records = ws.get_all_records()
-        return records if records else []
-    except gspread.exceptions.WorksheetNotFound:
-        return []
-    except Exception as e:
-        st.error(f"Error reading {worksheet_name}: {e}")
-        return []
-
-
-def read_all_values(worksheet_name: str) -> list[list]:
-    """Return raw rows including header as list of lists."""
-    try:
-        wb = get_workbook()
-        ws = wb.worksheet(worksheet_name)
-        return ws.get_all_values()
-    except Exception as e:
-        st.error(f"Error reading {worksheet_name}: {e}")
-        return []
-
-
-def update_row(worksheet_name: str, row_index: int, row_data: list):
-    """Update a row (1-indexed, row 1 = header)."""
-    try:
-        wb = get_workbook()
-        ws = wb.worksheet(worksheet_name)
-        for col_idx, value in enumerate(row_data, start=1):
-            ws.update_cell(row_index, col_idx, value)
-        return True
-    except Exception as e:
-        st.error(f"Error updating row in {worksheet_name}: {e}")
-        return False
-
-
-def delete_row(worksheet_name: str, row_index: int):
-    """Delete a row (1-indexed)."""
-    try:
-        wb = get_workbook()
-        ws = wb.worksheet(worksheet_name)
-        ws.delete_rows(row_index)
-        return True
-    except Exception as e:
-        st.error(f"Error deleting row in {worksheet_name}: {e}")
-        return False
-
-
-# ---------------------------------------------------------------------------
-# 3. Master-data helpers
-# ---------------------------------------------------------------------------
-
-PARTIES_SHEET = "Parties"
-ITEMS_SHEET = "Items"
-DAYBOOK_SHEET = "Daybook_FY26"
-OPENING_BAL_SHEET = "Opening Balances"
-
-# Default seed data (migrated from the old hardcoded lists)
-DEFAULT_PARTIES = [
-    ("Devansh", "Purchase"),
-    ("Raj", "Purchase"),
-    ("Bhr", "Purchase"),
-    ("Samyak", "Purchase"),
-    ("Aci", "Purchase"),
-    ("Radha", "Sale"),
-    ("Pravesh", "Sale"),
-    ("Rc", "Sale"),
-    ("Mci", "Sale"),
-    ("Jawaharji", "Sale"),
-    ("Munishji", "Sale"),
-    ("Sanjay", "Sale"),
-    ("Narayan", "Sale"),
-    ("Drum", "Sale"),
-    ("Papa", "Payment"),
-    ("Fact Exp", "Payment"),
-    ("Home Exp", "Payment"),
-    ("Gst", "Payment"),
-    ("Ranjeet", "Payment"),
-    ("Bhure", "Payment"),
-    ("Raja", "Payment"),
-    ("Mukesh", "Payment"),
-    ("Rajender", "Payment"),
-    ("Cash", "Bank"),  # Added Cash account
-    ("Icici", "Bank"),
-]
-
-DEFAULT_ITEMS = [
-    ("Resin", "Purchase"),
-    ("C1000", "Purchase"),
-    ("C001", "Purchase"),
-    ("Cpw", "Purchase"),
-    ("DOP", "Purchase"),
-    ("Dbp", "Purchase"),
-    ("Tbls", "Purchase"),
-    ("Dblp", "Purchase"),
-    ("Ls", "Purchase"),
-    ("St", "Purchase"),
-    ("Op304", "Purchase"),
-    ("Op318", "Purchase"),
-    ("Lqd", "Purchase"),
-    ("Eva", "Purchase"),
-    ("GST", "Purchase"),
-    ("Tin", "Purchase"),
-    ("Ap25", "Sale"),
-    ("Ap50", "Sale"),
-    ("Ap5", "Sale"),
-    ("1800n", "Sale"),
-    ("Rbc", "Sale"),
-    ("RBDbp", "Sale"),
-    ("Ap84", "Sale"),
-    ("L10", "Sale"),
-    ("L10dbp", "Sale"),
-    ("L20", "Sale"),
-    ("101n", "Sale"),
-    ("L2", "Sale"),
-    ("12dbp", "Sale"),
-    ("212n", "Sale"),
-    ("220n", "Sale"),
-    ("C3", "Sale"),
-    ("20n", "Sale"),
-    ("J20", "Sale"),
-    ("5dop", "Sale"),
-    ("Dop12", "Sale"),
-    ("2n", "Sale"),
-    ("6n", "Sale"),
-    ("115n", "Sale"),
-    ("15n", "Sale"),
-    ("P94", "Sale"),
-    ("P90", "Sale"),
-    ("P02", "Sale"),
-    ("P23", "Sale"),
-    ("P01", "Sale"),
-    ("Dt94", "Sale"),
-    ("Dop-Al", "Sale"),
-    ("GST", "Sale"),
-    ("18n", "Sale"),
-    ("25s", "Sale"),
-    ("Drm", "Sale"),
-]
-
-
-def ensure_sheet_exists(sheet_name: str, headers: list[str]):
-    """Create a worksheet tab if it doesn't exist yet."""
-    wb = get_workbook()
-    try:
-        wb.worksheet(sheet_name)
-    except gspread.exceptions.WorksheetNotFound:
-        ws = wb.add_worksheet(title=sheet_name, rows=200, cols=len(headers))
-        ws.append_row(headers, value_input_option="USER_ENTERED")
-
-
-def _migrate_opening_balances_sheet():
-    """Migrate old 3-column Opening Balances sheet to 4-column (with Date)."""
-    try:
-        wb = get_workbook()
-        ws = wb.worksheet(OPENING_BAL_SHEET)
-        header = ws.row_values(1)
-        if header and "Date" not in header:
-            all_vals = ws.get_all_values()
-            default_date = date(date.today().year, 4, 1).strftime("%m-%d-%Y")
-            new_rows = [["Party Name", "Date", "Debit", "Credit"]]
-            for row in all_vals[1:]:
-                if row and row[0]:
-                    dr = row[1] if len(row) > 1 else 0
-                    cr = row[2] if len(row) > 2 else 0
-                    new_rows.append([row[0], default_date, dr, cr])
-            ws.clear()
-            ws.update(range_name="A1", values=new_rows, value_input_option="USER_ENTERED")
-            read_all_rows.clear()
-    except Exception:
-        pass  # Don't crash app if migration fails
-
-
-def seed_master_data():
-    """One-time migration: populate Parties/Items sheets if they are empty."""
-    ensure_sheet_exists(PARTIES_SHEET, ["Name", "Category"])
-    ensure_sheet_exists(ITEMS_SHEET, ["Name", "Category"])
-    ensure_sheet_exists(OPENING_BAL_SHEET, ["Party Name", "Date", "Debit", "Credit"])
-
-    _migrate_opening_balances_sheet()
-
-    if len(read_all_values(PARTIES_SHEET)) <= 1:
-        wb = get_workbook()
-        ws = wb.worksheet(PARTIES_SHEET)
-        ws.append_rows([[n, c] for n, c in DEFAULT_PARTIES], value_input_option="USER_ENTERED")
-        read_all_rows.clear()
-
-    if len(read_all_values(ITEMS_SHEET)) <= 1:
-        wb = get_workbook()
-        ws = wb.worksheet(ITEMS_SHEET)
-        ws.append_rows([[n, c] for n, c in DEFAULT_ITEMS], value_input_option="USER_ENTERED")
-        read_all_rows.clear()
-
-
-def get_opening_balance(party_name: str, start_date: date) -> tuple[float, bool]:
-    """Return stored opening balance for a party if its date <= start_date.
-    Returns (balance, found) where balance = Debit - Credit.
-    Only applied if the opening balance date falls on or before start_date.
-    """
-    rows = read_all_rows(OPENING_BAL_SHEET)
-    for r in rows:
-        if r.get("Party Name", "") == party_name:
-            ob_date_str = r.get("Date", "")
-            try:
-                ob_date = datetime.strptime(ob_date_str, "%m-%d-%Y").date()
-            except (ValueError, TypeError):
-                ob_date = None
-
-            if ob_date and ob_date > start_date:
-                return 0.0, False
-
-            dr = float(r.get("Debit", 0) or 0)
-            cr = float(r.get("Credit", 0) or 0)
-            return dr - cr, True
-    return 0.0, False
-
-
-@st.cache_data(ttl=300)
-def get_parties(category: str = "") -> list[str]:
-    rows = read_all_rows(PARTIES_SHEET)
-    if category:
-        return sorted({r["Name"] for r in rows if r.get("Category") == category})
-    return sorted({r["Name"] for r in rows})
-
-
-@st.cache_data(ttl=300)
-def get_items(category: str = "") -> list[str]:
-    rows = read_all_rows(ITEMS_SHEET)
-    if category:
-        return sorted({r["Name"] for r in rows if r.get("Category") == category})
-    return sorted({r["Name"] for r in rows})
-
-
-def calculate_party_balance(party: str, upto_date: date = None) -> float:
-    """
-    Calculate final balance for a party till a given date.
-    If upto_date is None → calculates till today.
-
-    Logic:
-    Sale + Payment → Debit
-    Purchase + Receipt → Credit
-    Balance = Debit - Credit
-    """
-    if upto_date is None:
-        upto_date = date.today()
-
-    rows = read_all_rows(DAYBOOK_SHEET)
-
-    # Start with stored opening balance
-    opening_balance, has_ob = get_opening_balance(party, upto_date)
-    balance = opening_balance
-
-    # Get OB date to skip earlier entries
-    ob_date = None
-    if has_ob:
-        ob_rows = read_all_rows(OPENING_BAL_SHEET)
-        for r in ob_rows:
-            if r.get("Party Name", "") == party:
-                try:
-                    ob_date = datetime.strptime(r.get("Date", ""), "%m-%d-%Y").date()
-                except:
-                    pass
-                break
-
-    for r in rows:
-        if r.get("Party Name", r.get("Party", "")) != party:
-            continue
-
-        try:
-            d = datetime.strptime(r.get("Date", ""), "%m-%d-%Y").date()
-        except:
-            continue
-
-        # Skip entries before OB date (already included)
-        if ob_date and d < ob_date:
-            continue
-
-        if d > upto_date:
-            continue
-
-        vtype = r.get("Voucher Type", r.get("Type", ""))
-        amt = float(r.get("Amount", 0) or 0)
-
-        # YOUR REQUIRED LOGIC
-        if vtype in ("Sale", "Payment"):
-            balance += amt
-        elif vtype in ("Purchase", "Receipt"):
-            balance -= amt
-
-    return balance
-
-
-# ---------------------------------------------------------------------------
-# 4. Unified Entry Form (Purchase / Sale)
-# ---------------------------------------------------------------------------
-
-
-def render_entry_form(entry_type: str):
-    st.header(f"{entry_type} Entry")
-
-    cat = entry_type
-    date_val = st.date_input("Date", datetime.now(), key=f"{cat}_date")
-    slip_no = st.text_input("Slip No.", key=f"{cat}_slip")
-
-    parties = get_parties(cat)
-    if not parties:
-        st.warning(f"No parties found for category '{cat}'. Add them in Master Data.")
-        return
-
-    party_name = st.selectbox("Party Name", parties, key=f"{cat}_party")
-    num_items = st.number_input("Number of Items", min_value=1, step=1, value=1, key=f"{cat}_num")
-
-    items_list = get_items(cat)
-    collected = []
-
-    for i in range(int(num_items)):
-        st.subheader(f"Item {i + 1}")
-        if not items_list:
-            st.warning("No items found. Add them in Master Data.")
-            return
-
-        item_type = st.selectbox(f"Item Type {i + 1}", items_list, key=f"{cat}_it_{i}")
-        quantity = st.number_input(f"Quantity {i + 1} (kg)", min_value=0.0, step=0.1, key=f"{cat}_qty_{i}")
-        rate = st.number_input(f"Rate {i + 1} (per kg)", min_value=0.0, step=0.1, key=f"{cat}_rate_{i}")
-        gst_applied = st.checkbox(f"Apply GST for Item {i + 1}", key=f"{cat}_gst_{i}")
-
-        adjusted_rate = rate
-        if gst_applied:
-            gst_pct = st.number_input(f"GST % for Item {i + 1}", min_value=0.0, step=0.1, key=f"{cat}_gstp_{i}")
-            adjusted_rate += round(rate * gst_pct / 100, 2)
-
-        amount = quantity * adjusted_rate
-        collected.append((item_type, quantity, adjusted_rate, amount))
-
-    if st.button(f"Add {entry_type}", key=f"{cat}_submit"):
-        rows = []
-        for item_type, quantity, adjusted_rate, amount in collected:
-            rows.append([
-                date_val.strftime("%m-%d-%Y"),
-                slip_no,
-                entry_type,
-                party_name,
-                item_type,
-                quantity,
-                adjusted_rate,
-                amount,
-            ])
-
-        if append_rows_batch(DAYBOOK_SHEET, rows):
-            st.success(f"{entry_type} entry added successfully!")
-            read_all_rows.clear()
-
-
-# ---------------------------------------------------------------------------
-# 5. Payment / Receipt Form (UPDATED with Cash/Bank Transfer)
-# ---------------------------------------------------------------------------
-
-
-def render_payment_receipt():
-    st.header("Payment / Receipt Entry")
-
-    date_val = st.date_input("Date", datetime.now(), key="pr_date")
-    reference = st.text_input("Reference", key="pr_ref")
-
-    # Updated mode options - now includes GST
-    mode = st.selectbox("Mode", ["Cash", "Bank", "GST", "Bank Transfer"], key="pr_mode")
-
-    all_parties = sorted(
-        set(get_parties("Purchase") + get_parties("Sale") + get_parties("Payment") + get_parties("Bank"))
-    )
-
-    if not all_parties:
-        st.warning("No parties found. Add them in Master Data.")
-        return
-
-    # Bank Transfer mode - special handling
-    if mode == "Bank Transfer":
-        st.subheader("Transfer between Cash/Bank accounts")
-        
-        bank_parties = get_parties("Bank")
-        if len(bank_parties) < 2:
-            st.warning("You need at least 2 bank/cash accounts for transfers. Add them in Master Data.")
-            return
-
-        from_account = st.selectbox("From Account", bank_parties, key="pr_from_acc")
-        to_account = st.selectbox("To Account", [b for b in bank_parties if b != from_account], key="pr_to_acc")
-        amount = st.number_input("Amount", min_value=0.0, step=0.1, key="pr_transfer_amt")
-
-        if st.button("Record Transfer", key="pr_transfer_submit"):
-            rows = [
-                # Debit the receiving account (Receipt)
-                [date_val.strftime("%m-%d-%Y"), reference, "Receipt", to_account, "Bank", 0, 0, amount],
-                # Credit the sending account (Payment)
-                [date_val.strftime("%m-%d-%Y"), reference, "Payment", from_account, "Bank", 0, 0, amount],
-            ]
-
-            if append_rows_batch(DAYBOOK_SHEET, rows):
-                st.success(f"Transfer of ₹{amount:,.2f} from {from_account} to {to_account} recorded!")
-                read_all_rows.clear()
-        return
-
-    # Regular Payment/Receipt mode (including GST mode)
-    party_name = st.selectbox("Party Name", all_parties, key="pr_party")
-    voucher_type = st.selectbox("Voucher Type", ["Payment", "Receipt"], key="pr_vtype")
-    amount = st.number_input("Amount", min_value=0.0, step=0.1, key="pr_amt")
-
-    contra_account = None
-    
-    if mode == "Cash":
-        # Auto-select "Cash" account and show it
-        bank_parties = get_parties("Bank")
-        if "Cash" in bank_parties:
-            contra_account = "Cash"
-            st.info(f"💰 Contra entry will be posted to: **{contra_account}** account")
-        else:
-            st.warning("Cash account not found. Add 'Cash' party with category 'Bank' in Master Data.")
-            return
-            
-    elif mode == "Bank":
-        bank_parties = [b for b in get_parties("Bank") if b != "Cash"]
-        if bank_parties:
-            contra_account = st.selectbox("Bank Name", bank_parties, key="pr_bank")
-            st.info(f"🏦 Contra entry will be posted to: **{contra_account}** account")
-        else:
-            st.warning("No bank parties found. Add one in Master Data with category 'Bank'.")
-            return
-    
-    elif mode == "GST":
-        # GST mode - find GST party from Payment category
-        payment_parties = get_parties("Payment")
-        gst_parties = [p for p in payment_parties if "gst" in p.lower() or "Gst" in p or "GST" in p]
-        
-        if gst_parties:
-            if len(gst_parties) == 1:
-                contra_account = gst_parties[0]
-                st.info(f"📊 GST contra entry will be posted to: **{contra_account}** account")
-            else:
-                contra_account = st.selectbox("Select GST Account", gst_parties, key="pr_gst_acc")
-                st.info(f"📊 GST contra entry will be posted to: **{contra_account}** account")
-        else:
-            st.warning("No GST party found. Add 'Gst' party with category 'Payment' in Master Data.")
-            return
-
-    if st.button("Add Voucher", key="pr_submit"):
-        rows = [
-            # Main entry
-            [date_val.strftime("%m-%d-%Y"), reference, voucher_type, party_name, mode, 0, 0, amount]
-        ]
-
-        # Contra entry in Cash/Bank/GST account
-        if contra_account:
-            reverse = "Receipt" if voucher_type == "Payment" else "Payment"
-            rows.append([
-                date_val.strftime("%m-%d-%Y"), 
-                reference, 
-                reverse, 
-                contra_account, 
-                mode, 
-                0, 
-                0, 
-                amount
-            ])
-
-        if append_rows_batch(DAYBOOK_SHEET, rows):
-            mode_display = f"via {mode}" if mode != "GST" else "with GST adjustment"
-            st.success(f"{voucher_type} of ₹{amount:,.2f} recorded {mode_display}!")
-            read_all_rows.clear()
-
-# ---------------------------------------------------------------------------
-# 6. Party Ledger
-# ---------------------------------------------------------------------------
-
-
-def render_party_ledger():
-    st.header("Party Ledger")
-
-    all_parties = sorted(set(get_parties()))
-    if not all_parties:
-        st.info("No parties found.")
-        return
-
-    party = st.selectbox("Select Party", all_parties, key="led_party")
-
-    col1, col2 = st.columns(2)
-    with col1:
-        start_date = st.date_input("From", date(date.today().year, 4, 1), key="led_from")
-    with col2:
-        end_date = st.date_input("To", date.today(), key="led_to")
-
-    if st.button("Load Ledger", key="led_load"):
-        rows = read_all_rows(DAYBOOK_SHEET)
-
-        # Start with stored opening balance (only if its date <= start_date)
-        stored_bal, has_ob = get_opening_balance(party, start_date)
-        opening_balance = stored_bal
-
-        # Get the opening balance date to skip daybook entries before it
-        ob_date = None
-        if has_ob:
-            ob_rows = read_all_rows(OPENING_BAL_SHEET)
-            for r in ob_rows:
-                if r.get("Party Name", "") == party:
-                    try:
-                        ob_date = datetime.strptime(r.get("Date", ""), "%m-%d-%Y").date()
-                    except (ValueError, TypeError):
-                        pass
-                    break
-
-        records = []
-        for r in rows:
-            if r.get("Party Name", r.get("Party", "")) != party:
-                continue
-
-            raw_date = r.get("Date", "")
-            try:
-                d = datetime.strptime(raw_date, "%m-%d-%Y").date()
-            except (ValueError, TypeError):
-                continue
-
-            # Skip transactions on or before the opening balance date
-            # (they are already included in the stored balance)
-            if ob_date and d < ob_date:
-                continue
-
-            vtype = r.get("Voucher Type", r.get("Type", ""))
-            amt = float(r.get("Amount", 0) or 0)
-
-            debit = amt if vtype in ("Sale", "Payment") else 0.0
-            credit = amt if vtype in ("Purchase", "Receipt") else 0.0
-
-            # Transactions between OB date and start date add to opening balance
-            if d < start_date:
-                opening_balance += debit - credit
-                continue
-
-            if d > end_date:
-                continue
-
-            item = r.get("Item", "")
-            qty = r.get("Quantity", r.get("Qty", ""))
-            rate = r.get("Rate", "")
-            slip = r.get("Slip No.", r.get("Slip No", r.get("Reference", "")))
-
-            records.append({
-                "Date": raw_date,
-                "Slip": slip,
-                "Type": vtype,
-                "Item": item,
-                "Qty": qty,
-                "Rate": rate,
-                "Debit": debit,
-                "Credit": credit,
-            })
-
-        # Build dataframe with opening balance row
-        if opening_balance != 0 or records:
-            ob_dr = opening_balance if opening_balance > 0 else 0.0
-            ob_cr = abs(opening_balance) if opening_balance < 0 else 0.0
-
-            opening_row = {
-                "Date": "",
-                "Slip": "",
-                "Type": "Opening Balance",
-                "Item": "",
-                "Qty": "",
-                "Rate": "",
-                "Debit": ob_dr,
-                "Credit": ob_cr,
-            }
-
-            df = pd.DataFrame([opening_row] + records)
-
-            # Separate OB
-            opening_df = df.iloc[[0]]
-            transactions_df = df.iloc[1:].copy()
-            transactions_df["Date"] = pd.to_datetime(transactions_df["Date"], errors="coerce")
-            transactions_df = transactions_df.sort_values("Date")
-            df = pd.concat([opening_df, transactions_df]).reset_index(drop=True)
-
-            # Running balance: start from opening, then cumulative sum of net movements
-            running = 0.0
-            balances = []
-            for _, row in df.iterrows():
-                running += float(row["Debit"]) - float(row["Credit"])
-                balances.append(running)
-
-            df["Balance"] = balances
-
-            st.session_state["ledger_df"] = df
-            st.session_state["ledger_party"] = party
-            st.session_state["ledger_range"] = f"{start_date} to {end_date}"
-        else:
-            st.info("No entries found for the selected party.")
-            return
-
-    if "ledger_df" in st.session_state:
-        df = st.session_state["ledger_df"]
-        st.dataframe(df, use_container_width=True)
-
-        totals = df[["Debit", "Credit"]].sum()
-        c1, c2, c3 = st.columns(3)
-        c1.metric("Total Debit", f"{totals['Debit']:,.2f}")
-        c2.metric("Total Credit", f"{totals['Credit']:,.2f}")
-        c3.metric("Net Balance", f"{df['Balance'].iloc[-1]:,.2f}")
-
-        pdf_bytes = generate_ledger_pdf(
-            df,
-            st.session_state["ledger_party"],
-            st.session_state["ledger_range"],
-        )
-        st.download_button(
-            "Download PDF",
-            data=pdf_bytes,
-            file_name=f"Ledger_{st.session_state['ledger_party']}.pdf",
-            mime="application/pdf",
-        )
-
-
-# ---------------------------------------------------------------------------
-# 7. PDF Export
-# ---------------------------------------------------------------------------
-
-
-def generate_ledger_pdf(df: pd.DataFrame, party: str, date_range: str) -> bytes:
-    pdf = FPDF(orientation="P", unit="mm", format="A4")
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-
-    pdf.set_font("Helvetica", "B", 14)
-    pdf.cell(0, 10, f"Party Ledger: {party}", ln=True, align="C")
-    pdf.set_font("Helvetica", "", 10)
-    pdf.cell(0, 6, f"Period: {date_range}", ln=True, align="C")
-    pdf.ln(4)
-
-    cols = list(df.columns)
-    col_widths = {
-        "Date": 28,
-        "Slip": 16,
-        "Type": 20,
-        "Item": 20,
-        "Qty": 20,
-        "Rate": 18,
-        "Debit": 22,
-        "Credit": 22,
-        "Balance": 26,
-    }
-
-    pdf.set_font("Helvetica", "B", 9)
-    for c in cols:
-        w = col_widths.get(c, 25)
-        pdf.cell(w, 7, c, border=1, align="C")
-    pdf.ln()
-
-    pdf.set_font("Helvetica", "", 8)
-    for _, row in df.iterrows():
-        for c in cols:
-            w = col_widths.get(c, 25)
-            val = row[c]
-            text = f"{val:,.2f}" if isinstance(val, float) else str(val)
-            pdf.cell(w, 6, text, border=1, align="R" if isinstance(val, float) else "L")
-        pdf.ln()
-
-    pdf.set_font("Helvetica", "B", 9)
-    for c in cols:
-        w = col_widths.get(c, 25)
-        if c == "Debit":
-            pdf.cell(w, 7, f"{df['Debit'].sum():,.2f}", border=1, align="R")
-        elif c == "Credit":
-            pdf.cell(w, 7, f"{df['Credit'].sum():,.2f}", border=1, align="R")
-        elif c == "Balance":
-            pdf.cell(w, 7, f"{df['Balance'].iloc[-1]:,.2f}", border=1, align="R")
-        elif c == "Date":
-            pdf.cell(w, 7, "TOTAL", border=1, align="C")
-        else:
-            pdf.cell(w, 7, "", border=1)
-    pdf.ln()
-
-    buf = io.BytesIO()
-    pdf.output(buf)
-    return buf.getvalue()
-
-
-# ---------------------------------------------------------------------------
-# 8. Dashboard
-# ---------------------------------------------------------------------------
-
-
-def render_dashboard():
-    st.header("Dashboard")
-
-    rows = read_all_rows(DAYBOOK_SHEET)
-    if not rows:
-        st.info("No data in Daybook yet.")
-        return
-
-    df = pd.DataFrame(rows)
-    col_map = {col: col.strip() for col in df.columns}
-    df.rename(columns=col_map, inplace=True)
-
-    type_col = None
-    for candidate in ("Voucher Type", "Type", "type"):
-        if candidate in df.columns:
-            type_col = candidate
-            break
-
-    amt_col = None
-    for candidate in ("Amount", "amount"):
-        if candidate in df.columns:
-            amt_col = candidate
-            break
-
-    party_col = None
-    for candidate in ("Party Name", "Party", "party"):
-        if candidate in df.columns:
-            party_col = candidate
-            break
-
-    if not type_col or not amt_col:
-        st.warning("Daybook columns not recognised. Expected 'Voucher Type' and 'Amount'.")
-        return
-
-    df[amt_col] = pd.to_numeric(df[amt_col], errors="coerce").fillna(0)
-
-    if party_col:
-        st.subheader("Outstanding Balances")
-        all_parties = sorted(set(df[party_col]))
-
-        final_summary = []
-        for party in all_parties:
-            bal = calculate_party_balance(party)
-            if abs(bal) > 0.01:
-                final_summary.append({
-                    "Party": party,
-                    "Balance": bal
-                })
-
-        if final_summary:
-            summary_df = pd.DataFrame(final_summary).sort_values("Balance", ascending=False)
-            st.dataframe(summary_df, use_container_width=True)
-        else:
-            st.info("No outstanding balances.")
-
-
-# ---------------------------------------------------------------------------
-# 9. Master Data Management
-# ---------------------------------------------------------------------------
-
-
-def render_master_data():
-    st.header("Master Data")
-
-    tab1, tab2, tab3 = st.tabs(["Parties", "Items", "Opening Balances"])
-
-    with tab1:
-        _master_data_tab(PARTIES_SHEET, "Party", ["Name", "Category"],
-                         category_options=["Purchase", "Sale", "Payment", "Bank"])
-
-    with tab2:
-        _master_data_tab(ITEMS_SHEET, "Item", ["Name", "Category"],
-                         category_options=["Purchase", "Sale"])
-
-    with tab3:
-        _opening_balances_tab()
-
-
-def _master_data_tab(sheet_name: str, label: str, headers: list[str], category_options: list[str]):
-    all_vals = read_all_values(sheet_name)
-
-    if len(all_vals) <= 1:
-        st.info(f"No {label.lower()}s found.")
-        data_rows = []
-    else:
-        data_rows = all_vals[1:]
-
-    if data_rows:
-        st.subheader(f"Existing {label}s")
-        for idx, row in enumerate(data_rows):
-            row_num = idx + 2
-            cols = st.columns([3, 2, 1, 1])
-            cols[0].write(row[0] if len(row) > 0 else "")
-            cols[1].write(row[1] if len(row) > 1 else "")
-
-            if cols[2].button("Edit", key=f"{sheet_name}_edit_{idx}"):
-                st.session_state[f"{sheet_name}_editing"] = row_num
-
-            if cols[3].button("Del", key=f"{sheet_name}_del_{idx}"):
-                if delete_row(sheet_name, row_num):
-                    st.success(f"{label} deleted.")
-                    read_all_rows.clear()
-                    get_parties.clear()
-                    get_items.clear()
-                    st.rerun()
-
-    editing_key = f"{sheet_name}_editing"
-    if editing_key in st.session_state:
-        row_num = st.session_state[editing_key]
-        st.subheader(f"Edit {label}")
-
-        current = all_vals[row_num - 1] if row_num - 1 < len(all_vals) else ["", ""]
-        new_name = st.text_input("Name", value=current[0] if len(current) > 0 else "", key=f"{sheet_name}_ename")
-
-        cat_idx = category_options.index(current[1]) if len(current) > 1 and current[1] in category_options else 0
-        new_cat = st.selectbox("Category", category_options, index=cat_idx, key=f"{sheet_name}_ecat")
-
-        c1, c2 = st.columns(2)
-        if c1.button("Save", key=f"{sheet_name}_esave"):
-            if update_row(sheet_name, row_num, [new_name, new_cat]):
-                st.success(f"{label} updated.")
-                del st.session_state[editing_key]
-                read_all_rows.clear()
-                get_parties.clear()
-                get_items.clear()
-                st.rerun()
-
-        if c2.button("Cancel", key=f"{sheet_name}_ecancel"):
-            del st.session_state[editing_key]
-            st.rerun()
-
-    st.subheader(f"Add {label}")
-    new_name = st.text_input(f"New {label} Name", key=f"{sheet_name}_new_name")
-    new_cat = st.selectbox(f"{label} Category", category_options, key=f"{sheet_name}_new_cat")
-
-    if st.button(f"Add {label}", key=f"{sheet_name}_add"):
-        if new_name.strip():
-            if append_row(sheet_name, [new_name.strip(), new_cat]):
-                st.success(f"{label} '{new_name.strip()}' added.")
-                read_all_rows.clear()
-                get_parties.clear()
-                get_items.clear()
-                st.rerun()
-        else:
-            st.warning("Name cannot be empty.")
-
-
-def _opening_balances_tab():
-    """Manage opening balances per party in a separate sheet."""
-    all_vals = read_all_values(OPENING_BAL_SHEET)
-    data_rows = all_vals[1:] if len(all_vals) > 1 else []
-
-    # Build a lookup of existing parties with opening balances
-    existing = {}
-    for idx, row in enumerate(data_rows):
-        name = row[0] if len(row) > 0 else ""
-        if name:
-            existing[name] = idx
-
-    # Show existing opening balances
-    if data_rows:
-        st.subheader("Current Opening Balances")
-        display = []
-        for row in data_rows:
-            name = row[0] if len(row) > 0 else ""
-            ob_date = row[1] if len(row) > 1 else ""
-            dr = float(row[2]) if len(row) > 2 and row[2] else 0.0
-            cr = float(row[3]) if len(row) > 3 and row[3] else 0.0
-            bal = dr - cr
-            bal_type = "Dr" if bal >= 0 else "Cr"
-            display.append({
-                "Party Name": name,
-                "Date": ob_date,
-                "Debit": dr,
-                "Credit": cr,
-                "Balance": f"{abs(bal):,.2f} {bal_type}",
-            })
-        st.dataframe(pd.DataFrame(display), use_container_width=True)
-
-    # Edit / Add opening balance
-    st.subheader("Set Opening Balance")
-    all_parties = sorted(set(get_parties()))
-    if not all_parties:
-        st.info("No parties found. Add parties first.")
-        return
-
-    party = st.selectbox("Party", all_parties, key="ob_party")
-
-    # Pre-fill if party already has an opening balance
-    prefill_date = date(date.today().year, 4, 1)
-    prefill_dr, prefill_cr = 0.0, 0.0
-
-    if party in existing:
-        row = data_rows[existing[party]]
-        try:
-            prefill_date = datetime.strptime(row[1], "%m-%d-%Y").date() if len(row) > 1 and row[1] else prefill_date
-        except (ValueError, TypeError):
-            pass
-        prefill_dr = float(row[2]) if len(row) > 2 and row[2] else 0.0
-        prefill_cr = float(row[3]) if len(row) > 3 and row[3] else 0.0
-
-    ob_date = st.date_input("Balance as on date", value=prefill_date, key="ob_date",
-                            help="Transactions before this date are assumed included in this balance")
-
-    col1, col2 = st.columns(2)
-    with col1:
-        debit = st.number_input("Debit (they owe you)", min_value=0.0, step=0.1, value=prefill_dr, key="ob_dr")
-    with col2:
-        credit = st.number_input("Credit (you owe them)", min_value=0.0, step=0.1, value=prefill_cr, key="ob_cr")
-
-    if st.button("Save Opening Balance", key="ob_save"):
-        date_str = ob_date.strftime("%m-%d-%Y")
-
-        if party in existing:
-            row_num = existing[party] + 2
-            if update_row(OPENING_BAL_SHEET, row_num, [party, date_str, debit, credit]):
-                st.success(f"Opening balance updated for {party} as on {ob_date}.")
-                read_all_rows.clear()
-                st.rerun()
-        else:
-            if append_row(OPENING_BAL_SHEET, [party, date_str, debit, credit]):
-                st.success(f"Opening balance saved for {party} as on {ob_date}.")
-                read_all_rows.clear()
-                st.rerun()
-
-    # Delete option
-    if data_rows:
-        st.subheader("Remove Opening Balance")
-        del_party = st.selectbox("Select party to remove", list(existing.keys()), key="ob_del_party")
-        if st.button("Remove", key="ob_del"):
-            row_num = existing[del_party] + 2
-            if delete_row(OPENING_BAL_SHEET, row_num):
-                st.success(f"Opening balance removed for {del_party}.")
-                read_all_rows.clear()
-                st.rerun()
-
-
-# ---------------------------------------------------------------------------
-# 10. Main App
-# ---------------------------------------------------------------------------
-
-
-def main():
-    st.set_page_config(page_title="ERP Data Entry", layout="wide")
-
-    if "seeded" not in st.session_state:
-        seed_master_data()
-        st.session_state["seeded"] = True
-
-    st.sidebar.title("Menu")
-    menu = st.sidebar.radio(
-        "Select Page",
-        ["Dashboard", "Purchase Entry", "Sale Entry", "Payment/Receipt Entry", "Party Ledger", "Master Data"],
-    )
-
-    if menu == "Dashboard":
-        render_dashboard()
-    elif menu == "Purchase Entry":
-        render_entry_form("Purchase")
-    elif menu == "Sale Entry":
-        render_entry_form("Sale")
-    elif menu == "Payment/Receipt Entry":
-        render_payment_receipt()
-    elif menu == "Party Ledger":
-        render_party_ledger()
-    elif menu == "Master Data":
-        render_master_data()
-
-
-if __name__ == "__main__":
-    main()
+import streamlit as st
+import gspread
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, date
+from functools import lru_cache
+import hashlib
+import json
+import threading
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+from fpdf.fonts import FontFace
+
+# ---------------------------------------------------------------------------
+# 1. Authentication & Google Sheets connection
+# ---------------------------------------------------------------------------
+
+SCOPES = (
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive",
+)
+
+
+class _SheetsRetry(Retry):
+    """Retry 429s on every method (Sheets rejects them before applying anything),
+    but transient 5xx only on idempotent methods so appends are never duplicated.
+    """
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code == 429:
+            return bool(self.total)
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+# SHA-256 of the service-account secrets, hashed once per script run. The cached
+# connection objects below take it as their key, so rotating the key in secrets
+# rebuilds them, while every lookup stays a cheap hash of one short string.
+_CRED_FP = hashlib.sha256(
+    json.dumps(dict(st.secrets["gcp_service_account"]), sort_keys=True).encode()
+).hexdigest()
+
+
+@st.cache_resource
+def get_credentials(cred_fp: str) -> Credentials:
+    """Service-account credentials, parsed from secrets once per key."""
+    # The secrets section is already a read-only mapping; no need to copy it
+    return Credentials.from_service_account_info(st.secrets["gcp_service_account"], scopes=SCOPES)
+
+
+@st.cache_resource
+def get_gspread_client(cred_fp: str):
+    creds = get_credentials(cred_fp)
+
+    # Pooled keep-alive connections, with rate limits retried centrally using
+    # exponential backoff that honours Retry-After
+    retry = _SheetsRetry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    session = AuthorizedSession(creds)
+    session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry))
+    return gspread.Client(auth=creds, session=session)
+
+
+@st.cache_resource
+def _open_workbook(cred_fp: str):
+    client = get_gspread_client(cred_fp)
+    return client.open_by_key(st.secrets["sheets"]["sheet_id"])
+
+
+@st.cache_resource
+def _open_ws(worksheet_name: str, cred_fp: str):
+    return _open_workbook(cred_fp).worksheet(worksheet_name)
+
+
+# Tabs can be added or renamed in the Sheet itself, so the listing expires
+@st.cache_resource(ttl=300)
+def _ws_titles(cred_fp: str) -> frozenset[str]:
+    return frozenset(ws.title for ws in _open_workbook(cred_fp).worksheets())
+
+
+def get_workbook():
+    return _open_workbook(_CRED_FP)
+
+
+def get_ws(worksheet_name: str):
+    """Worksheet handle, looked up once per process instead of on every helper call."""
+    return _open_ws(worksheet_name, _CRED_FP)
+
+
+def get_ws_titles() -> frozenset[str]:
+    """Titles of every tab, from one metadata request. Cleared after adding a tab
+    and refreshed every five minutes to pick up tabs changed outside the app.
+    """
+    return _ws_titles(_CRED_FP)
+
+
+# ---------------------------------------------------------------------------
+# 2. Sheet helpers — with batch writes (retries live in the client session)
+# ---------------------------------------------------------------------------
+
+# Every tab keeps its header in row 1, so anchor appends there and insert rows
+# rather than having Sheets scan for the end of the table on each append
+APPEND_OPTIONS = {"table_range": "A1", "insert_data_option": "INSERT_ROWS"}
+
+# Writers default to USER_ENTERED so "%m-%d-%Y" strings become Sheets dates.
+# Plain-text rows (master data, headers) pass RAW: nothing for Sheets to parse,
+# and names like "0012" or "=x" are stored exactly as typed.
+
+
+def append_row(worksheet_name: str, row_data: list, value_input_option: str = "USER_ENTERED"):
+    try:
+        ws = get_ws(worksheet_name)
+        ws.append_row(row_data, value_input_option=value_input_option, **APPEND_OPTIONS)
+        return True
+    except Exception as e:
+        st.error(f"Error writing to {worksheet_name}: {e}")
+        return False
+
+
+def append_rows_batch(worksheet_name: str, rows: list[list], value_input_option: str = "USER_ENTERED"):
+    """Batch-append multiple rows in a single API call (much faster)."""
+    try:
+        ws = get_ws(worksheet_name)
+        ws.append_rows(rows, value_input_option=value_input_option, **APPEND_OPTIONS)
+        return True
+    except Exception as e:
+        st.error(f"Error writing to {worksheet_name}: {e}")
+        return False
+
+
+def _to_records(vals: list[list]) -> list[dict]:
+    """Bind raw sheet values to the header row with pandas (get_all_records builds rows in Python)."""
+    if len(vals) <= 1:
+        return []
+    df = pd.DataFrame(vals[1:], columns=[str(c).strip() for c in vals[0]])
+    return df.to_dict("records")
+
+
+def _fetch_rows(worksheet_name: str) -> list[dict]:
+    """Read a sheet as records. Errors propagate so the caches below never store them."""
+    try:
+        ws = get_ws(worksheet_name)
+    except gspread.exceptions.WorksheetNotFound:
+        return []
+    # Unformatted numbers avoid "1,234.00" strings; dates stay as displayed.
+    vals = ws.get_values(
+        value_render_option=gspread.utils.ValueRenderOption.unformatted,
+        date_time_render_option=gspread.utils.DateTimeOption.formatted_string,
+    )
+    return _to_records(vals)
+
+
+# Master data rarely changes and every write from this app invalidates it
+# explicitly; the TTL bounds how long edits made outside the app stay hidden.
+@st.cache_data(ttl=300, max_entries=8)
+def read_master(worksheet_name: str) -> list[dict]:
+    return _fetch_rows(worksheet_name)
+
+
+# The ledger and dashboard always need the Daybook and the Opening Balances
+# together, so both come from one values.batchGet and share one cache entry.
+# The Daybook is append-only within a session, so a short TTL is enough.
+@st.cache_data(ttl=600, max_entries=2, show_spinner=False)
+def read_daybook_and_ob() -> tuple[list[dict], list[dict]]:
+    # A missing tab would fail the whole batch
+    titles = get_ws_titles()
+    names = [name for name in (DAYBOOK_SHEET, OPENING_BAL_SHEET) if name in titles]
+
+    records = {DAYBOOK_SHEET: [], OPENING_BAL_SHEET: []}
+    if names:
+        resp = get_workbook().values_batch_get(
+            [gspread.utils.absolute_range_name(name) for name in names],
+            params={"valueRenderOption": "UNFORMATTED_VALUE", "dateTimeRenderOption": "FORMATTED_STRING"},
+        )
+        for name, value_range in zip(names, resp.get("valueRanges", [])):
+            # batchGet trims trailing empty cells; pad like get_values does
+            records[name] = _to_records(gspread.utils.fill_gaps(value_range.get("values", [])))
+    return records[DAYBOOK_SHEET], records[OPENING_BAL_SHEET]
+
+
+class SheetReadError(Exception):
+    """A sheet could not be read. Raised through every cached layer, so a failed
+    read is never stored as empty data; main() reports it for the page.
+    """
+
+
+def read_all_rows(worksheet_name: str) -> list[dict]:
+    """Cached records of a sheet, from the Daybook/OB or master-data cache."""
+    try:
+        if worksheet_name == DAYBOOK_SHEET:
+            return read_daybook_and_ob()[0]
+        if worksheet_name == OPENING_BAL_SHEET:
+            return read_daybook_and_ob()[1]
+        return read_master(worksheet_name)
+    except Exception as e:
+        raise SheetReadError(f"Error reading {worksheet_name}: {e}") from e
+
+
+# Raw grids back the Master Data editor; cached so its reruns don't re-download
+# the sheet, and cleared by invalidate_sheet after every write.
+@st.cache_data(ttl=60, max_entries=8, show_spinner=False)
+def read_values(worksheet_name: str) -> list[list]:
+    return get_ws(worksheet_name).get_all_values()
+
+
+def read_all_values(worksheet_name: str) -> list[list]:
+    """Return raw rows including header as list of lists."""
+    try:
+        return read_values(worksheet_name)
+    except Exception as e:
+        raise SheetReadError(f"Error reading {worksheet_name}: {e}") from e
+
+
+def _row_range(row_index: int, width: int) -> str:
+    """A1 range covering columns 1..width of a row, e.g. A5:D5 (works past column Z)."""
+    start = gspread.utils.rowcol_to_a1(row_index, 1)
+    end = gspread.utils.rowcol_to_a1(row_index, width)
+    return f"{start}:{end}"
+
+
+def update_row(worksheet_name: str, row_index: int, row_data: list, value_input_option: str = "USER_ENTERED"):
+    """Update a row (1-indexed, row 1 = header) in a single range write."""
+    try:
+        ws = get_ws(worksheet_name)
+        ws.update(
+            range_name=_row_range(row_index, len(row_data)),
+            values=[row_data],
+            value_input_option=value_input_option,
+        )
+        return True
+    except Exception as e:
+        st.error(f"Error updating row in {worksheet_name}: {e}")
+        return False
+
+
+def update_rows_batch(worksheet_name: str, updates: dict[int, list], value_input_option: str = "USER_ENTERED"):
+    """Update several rows {row_index: row_data} in a single batch_update call."""
+    data = [
+        {"range": _row_range(row_index, len(row_data)), "values": [row_data]}
+        for row_index, row_data in updates.items()
+    ]
+    try:
+        ws = get_ws(worksheet_name)
+        ws.batch_update(data, value_input_option=value_input_option)
+        return True
+    except Exception as e:
+        st.error(f"Error updating rows in {worksheet_name}: {e}")
+        return False
+
+
+def delete_row(worksheet_name: str, row_index: int):
+    """Delete a row (1-indexed)."""
+    try:
+        ws = get_ws(worksheet_name)
+        ws.delete_rows(row_index)
+        return True
+    except Exception as e:
+        st.error(f"Error deleting row in {worksheet_name}: {e}")
+        return False
+
+
+def find_row(worksheet_name: str, value, column: int = 1) -> int | None:
+    """Current row number (1-indexed) of the first cell in a column equal to value.
+    Reads only that column, so the result reflects edits made since the last cached read.
+    Returns None only when nothing matches; a failed read raises SheetReadError, so
+    callers never mistake an error for "no row yet".
+    """
+    try:
+        ws = get_ws(worksheet_name)
+        # Unformatted, like the cached records the value came from; compare as
+        # text so a numeric-looking name (12 vs "12") still matches
+        values = ws.col_values(column, value_render_option=gspread.utils.ValueRenderOption.unformatted)
+    except Exception as e:
+        raise SheetReadError(f"Error reading {worksheet_name}: {e}") from e
+    target = str(value)
+    return next((i for i, cell in enumerate(values, start=1) if str(cell) == target), None)
+
+
+# ---------------------------------------------------------------------------
+# 3. Master-data helpers
+# ---------------------------------------------------------------------------
+
+PARTIES_SHEET = "Parties"
+ITEMS_SHEET = "Items"
+DAYBOOK_SHEET = "Daybook_FY26"
+OPENING_BAL_SHEET = "Opening Balances"
+
+# Column order of every row written to the Daybook
+DAYBOOK_HEADERS = ["Date", "Slip No.", "Voucher Type", "Party Name", "Item", "Quantity", "Rate", "Amount"]
+# Header spellings found in older Daybook tabs, mapped to the canonical names
+DAYBOOK_ALIASES = {
+    "Slip No": "Slip No.",
+    "Reference": "Slip No.",
+    "Type": "Voucher Type",
+    "type": "Voucher Type",
+    "Party": "Party Name",
+    "party": "Party Name",
+    "Qty": "Quantity",
+    "amount": "Amount",
+}
+# Balances and ledgers are meaningless without these; their absence is reported
+DAYBOOK_REQUIRED = ("Voucher Type", "Amount", "Party Name")
+
+# Default seed data (migrated from the old hardcoded lists)
+DEFAULT_PARTIES = (
+    ("Devansh", "Purchase"),
+    ("Raj", "Purchase"),
+    ("Bhr", "Purchase"),
+    ("Samyak", "Purchase"),
+    ("Aci", "Purchase"),
+    ("Radha", "Sale"),
+    ("Pravesh", "Sale"),
+    ("Rc", "Sale"),
+    ("Mci", "Sale"),
+    ("Jawaharji", "Sale"),
+    ("Munishji", "Sale"),
+    ("Sanjay", "Sale"),
+    ("Narayan", "Sale"),
+    ("Drum", "Sale"),
+    ("Papa", "Payment"),
+    ("Fact Exp", "Payment"),
+    ("Home Exp", "Payment"),
+    ("Gst", "Payment"),
+    ("Ranjeet", "Payment"),
+    ("Bhure", "Payment"),
+    ("Raja", "Payment"),
+    ("Mukesh", "Payment"),
+    ("Rajender", "Payment"),
+    ("Cash", "Bank"),  # Added Cash account
+    ("Icici", "Bank"),
+)
+
+DEFAULT_ITEMS = (
+    ("Resin", "Purchase"),
+    ("C1000", "Purchase"),
+    ("C001", "Purchase"),
+    ("Cpw", "Purchase"),
+    ("DOP", "Purchase"),
+    ("Dbp", "Purchase"),
+    ("Tbls", "Purchase"),
+    ("Dblp", "Purchase"),
+    ("Ls", "Purchase"),
+    ("St", "Purchase"),
+    ("Op304", "Purchase"),
+    ("Op318", "Purchase"),
+    ("Lqd", "Purchase"),
+    ("Eva", "Purchase"),
+    ("GST", "Purchase"),
+    ("Tin", "Purchase"),
+    ("Ap25", "Sale"),
+    ("Ap50", "Sale"),
+    ("Ap5", "Sale"),
+    ("1800n", "Sale"),
+    ("Rbc", "Sale"),
+    ("RBDbp", "Sale"),
+    ("Ap84", "Sale"),
+    ("L10", "Sale"),
+    ("L10dbp", "Sale"),
+    ("L20", "Sale"),
+    ("101n", "Sale"),
+    ("L2", "Sale"),
+    ("12dbp", "Sale"),
+    ("212n", "Sale"),
+    ("220n", "Sale"),
+    ("C3", "Sale"),
+    ("20n", "Sale"),
+    ("J20", "Sale"),
+    ("5dop", "Sale"),
+    ("Dop12", "Sale"),
+    ("2n", "Sale"),
+    ("6n", "Sale"),
+    ("115n", "Sale"),
+    ("15n", "Sale"),
+    ("P94", "Sale"),
+    ("P90", "Sale"),
+    ("P02", "Sale"),
+    ("P23", "Sale"),
+    ("P01", "Sale"),
+    ("Dt94", "Sale"),
+    ("Dop-Al", "Sale"),
+    ("GST", "Sale"),
+    ("18n", "Sale"),
+    ("25s", "Sale"),
+    ("Drm", "Sale"),
+)
+
+
+def ensure_sheet_exists(sheet_name: str, headers: list[str]):
+    """Create a worksheet tab if it doesn't exist yet."""
+    if sheet_name in get_ws_titles():
+        return
+    ws = get_workbook().add_worksheet(title=sheet_name, rows=200, cols=len(headers))
+    ws.append_row(headers, value_input_option="RAW")
+    _ws_titles.clear()
+
+
+def _migrate_opening_balances_sheet():
+    """Migrate old 3-column Opening Balances sheet to 4-column (with Date).
+    Errors propagate so the once-per-process seeding is not cached as done.
+    """
+    ws = get_ws(OPENING_BAL_SHEET)
+    # Bounded reads: only the header cells, then only the old 3 data columns
+    header = ws.get("A1:D1")
+    header = header[0] if header else []
+    if header and "Date" not in header:
+        data_vals = ws.get("A2:C")
+        default_date = date(date.today().year, 4, 1).strftime("%m-%d-%Y")
+        new_rows = [["Party Name", "Date", "Debit", "Credit"]]
+        for row in data_vals:
+            if row and row[0]:
+                dr = row[1] if len(row) > 1 else 0
+                cr = row[2] if len(row) > 2 else 0
+                new_rows.append([row[0], default_date, dr, cr])
+        # Overwrite in place, blanking any leftover rows, instead of clear() + update()
+        end_row = max(len(new_rows), len(data_vals) + 1)
+        padding = [[""] * 4 for _ in range(end_row - len(new_rows))]
+        ws.update(range_name=f"A1:D{end_row}", values=new_rows + padding, value_input_option="USER_ENTERED")
+        invalidate_sheet(OPENING_BAL_SHEET)
+
+
+def _sheet_is_empty(ws) -> bool:
+    """True if the sheet has no data below its header (reads a single cell)."""
+    return not ws.acell("A2").value
+
+
+def seed_master_data():
+    """One-time migration: populate Parties/Items sheets if they are empty."""
+    if st.session_state.get("_seeded"):
+        return
+    try:
+        _seed_master_data_once()
+    except Exception as e:
+        # Don't crash the page; nothing was cached, so the next run retries
+        st.warning(f"Master data setup did not finish: {e}. It will be retried.")
+        return
+    st.session_state["_seeded"] = True
+
+
+@st.cache_resource(show_spinner=False)
+def _seed_master_data_once() -> bool:
+    """Run the seeding/migration once per server process, not once per session.
+    A failed run raises and is not cached, so the next session retries it.
+    """
+    ensure_sheet_exists(PARTIES_SHEET, ["Name", "Category"])
+    ensure_sheet_exists(ITEMS_SHEET, ["Name", "Category"])
+    ensure_sheet_exists(OPENING_BAL_SHEET, ["Party Name", "Date", "Debit", "Credit"])
+    ensure_sheet_exists(DAYBOOK_SHEET, DAYBOOK_HEADERS)
+
+    _migrate_opening_balances_sheet()
+
+    ws = get_ws(PARTIES_SHEET)
+    if _sheet_is_empty(ws):
+        ws.append_rows([[n, c] for n, c in DEFAULT_PARTIES], value_input_option="RAW", **APPEND_OPTIONS)
+        invalidate_sheet(PARTIES_SHEET)
+
+    ws = get_ws(ITEMS_SHEET)
+    if _sheet_is_empty(ws):
+        ws.append_rows([[n, c] for n, c in DEFAULT_ITEMS], value_input_option="RAW", **APPEND_OPTIONS)
+        invalidate_sheet(ITEMS_SHEET)
+
+    return True
+
+
+@lru_cache(maxsize=8192)
+def _parse_mdy(value: str) -> date | None:
+    """Parse a sheet date in MM-DD-YYYY format; None if blank or invalid."""
+    try:
+        return datetime.strptime(value, "%m-%d-%Y").date()
+    except (ValueError, TypeError):
+        return None
+
+
+@st.cache_data(ttl=300)
+def get_opening_balances_map() -> dict[str, tuple[date | None, float, float]]:
+    """Return {party: (ob_date, debit, credit)} from the Opening Balances sheet.
+    If a party appears more than once, the first row wins.
+    """
+    ob_map = {}
+    for r in read_all_rows(OPENING_BAL_SHEET):
+        name = r.get("Party Name", "")
+        if name in ob_map:
+            continue
+        ob_date = _parse_mdy(r.get("Date", ""))
+        ob_map[name] = (ob_date, float(r.get("Debit", 0) or 0), float(r.get("Credit", 0) or 0))
+    return ob_map
+
+
+@st.cache_data(ttl=300)
+def opening_balance_index() -> tuple[list[dict], dict[str, dict]]:
+    """Return the Opening Balances records and a {party: record} index built from
+    that same read, so the two can never disagree. First row wins, matching
+    get_opening_balances_map and find_row.
+    """
+    rows = read_all_rows(OPENING_BAL_SHEET)
+    index = {}
+    for r in rows:
+        if r.get("Party Name"):
+            index.setdefault(r["Party Name"], r)
+    return rows, index
+
+
+def get_opening_balance(party_name: str, start_date: date) -> tuple[float, bool]:
+    """Return stored opening balance for a party if its date <= start_date.
+    Returns (balance, found) where balance = Debit - Credit.
+    Only applied if the opening balance date falls on or before start_date.
+    """
+    ob = get_opening_balances_map().get(party_name)
+    if ob is None:
+        return 0.0, False
+
+    ob_date, dr, cr = ob
+    if ob_date and ob_date > start_date:
+        return 0.0, False
+    return dr - cr, True
+
+
+def _names_by_category(rows: list[dict]) -> dict[str, tuple[str, ...]]:
+    """Group master-data rows into {category: sorted unique names}."""
+    grouped = {}
+    for r in rows:
+        grouped.setdefault(r.get("Category", ""), set()).add(r["Name"])
+    return {cat: tuple(sorted(names)) for cat, names in grouped.items()}
+
+
+# The Master Data page clears these on edit; the TTL picks up edits made directly
+# in the Sheet or from another replica. Kept in memory only, so a restart always
+# re-reads. Names are stored as presorted tuples so a cache hit does no sorting.
+@st.cache_data(ttl=300, max_entries=2)
+def get_parties_by_category() -> dict[str, tuple[str, ...]]:
+    return _names_by_category(read_all_rows(PARTIES_SHEET))
+
+
+@st.cache_data(ttl=300, max_entries=2)
+def get_items_by_category() -> dict[str, tuple[str, ...]]:
+    return _names_by_category(read_all_rows(ITEMS_SHEET))
+
+
+@st.cache_data(ttl=300, max_entries=2)
+def get_all_parties() -> tuple[str, ...]:
+    """Sorted names of every party, across all categories."""
+    return tuple(sorted({name for names in get_parties_by_category().values() for name in names if name}))
+
+
+def get_parties(category: str = "") -> tuple[str, ...]:
+    if category:
+        return get_parties_by_category().get(category, ())
+    return get_all_parties()
+
+
+def get_items(category: str = "") -> tuple[str, ...]:
+    by_category = get_items_by_category()
+    if category:
+        return by_category.get(category, ())
+    return tuple(sorted({name for names in by_category.values() for name in names}))
+
+
+@st.cache_data(ttl=120, max_entries=2)
+def load_daybook_df() -> pd.DataFrame:
+    """
+    Daybook as a DataFrame with every DAYBOOK_HEADERS column present (legacy
+    header spellings renamed), numeric Amount and a parsed _date column.
+    Required columns the sheet did not really have are listed in attrs["missing"].
+    """
+    df = pd.DataFrame(read_all_rows(DAYBOOK_SHEET))
+    df.columns = [str(c).strip() for c in df.columns]
+    aliases = {old: new for old, new in DAYBOOK_ALIASES.items() if new not in df.columns}
+    df = df.rename(columns=aliases)
+    df = df.loc[:, ~df.columns.duplicated()]
+    missing = [col for col in DAYBOOK_REQUIRED if col not in df.columns]
+    for col in DAYBOOK_HEADERS:
+        if col not in df.columns:
+            df[col] = ""
+    df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce").fillna(0.0)
+    # Parsed once here for every page; cache=True converts each distinct date string once
+    df["_date"] = pd.to_datetime(df["Date"], format="%m-%d-%Y", errors="coerce", cache=True)
+    df.attrs["missing"] = missing
+    return df
+
+
+def daybook_columns_recognised(df: pd.DataFrame) -> bool:
+    """Warn and return False if a non-empty Daybook lacks a required column."""
+    missing = df.attrs.get("missing", [])
+    if df.empty or not missing:
+        return True
+    st.warning(
+        "Daybook columns not recognised. Expected "
+        + ", ".join(f"'{c}'" for c in DAYBOOK_REQUIRED)
+        + f"; missing {', '.join(repr(c) for c in missing)}."
+    )
+    return False
+
+
+def invalidate_sheet(worksheet_name: str):
+    """Drop cached reads of one sheet and the lookups derived from it, leaving other sheets warm."""
+    read_values.clear(worksheet_name)
+    if worksheet_name in (DAYBOOK_SHEET, OPENING_BAL_SHEET):
+        read_daybook_and_ob.clear()
+    else:
+        read_master.clear(worksheet_name)
+
+    if worksheet_name == PARTIES_SHEET:
+        get_parties_by_category.clear()
+        get_all_parties.clear()
+    elif worksheet_name == ITEMS_SHEET:
+        get_items_by_category.clear()
+    elif worksheet_name == OPENING_BAL_SHEET:
+        get_opening_balances_map.clear()
+        opening_balance_index.clear()
+    elif worksheet_name == DAYBOOK_SHEET:
+        load_daybook_df.clear()
+
+
+def calculate_all_party_balances(upto_date: date = None) -> pd.Series:
+    """
+    Balance of every party in the Daybook till a given date, computed in a
+    single vectorised pass. If upto_date is None → calculates till today.
+    Returns balances indexed by party.
+
+    Logic:
+    Sale + Payment → Debit
+    Purchase + Receipt → Credit
+    Balance = Debit - Credit, plus the stored opening balance; entries
+    before a party's opening-balance date are already included in it.
+    """
+    if upto_date is None:
+        upto_date = date.today()
+
+    df = load_daybook_df()
+    if df.empty:
+        return pd.Series(dtype=float)
+
+    # Opening balances that apply on upto_date, keyed by party
+    ob_balances, ob_dates = {}, {}
+    for name, (ob_date, dr, cr) in get_opening_balances_map().items():
+        if ob_date and ob_date > upto_date:
+            continue
+        ob_balances[name] = dr - cr
+        if ob_date:
+            ob_dates[name] = pd.Timestamp(ob_date)
+
+    dates = df["_date"]
+    amounts = df["Amount"]
+    vtype = df["Voucher Type"]
+
+    # Skip entries before the party's OB date (already included) and after upto_date
+    ob_start = pd.to_datetime(df["Party Name"].map(ob_dates))
+    in_range = dates.notna() & (dates <= pd.Timestamp(upto_date)) & ~(dates < ob_start)
+
+    signed = np.where(
+        vtype.isin(["Sale", "Payment"]),
+        amounts,
+        np.where(vtype.isin(["Purchase", "Receipt"]), -amounts, 0.0),
+    )
+    signed = pd.Series(np.where(in_range, signed, 0.0), index=df.index)
+
+    balances = signed.groupby(df["Party Name"]).sum()
+    return balances.add(pd.Series(ob_balances, dtype=float), fill_value=0).reindex(balances.index)
+
+
+# ---------------------------------------------------------------------------
+# 4. Unified Entry Form (Purchase / Sale)
+# ---------------------------------------------------------------------------
+
+# Forms are not cleared on submit: a failed write or a rejected entry keeps
+# what was typed. Only a saved entry resets the form's widgets.
+
+
+def clear_saved_form(keys: list[str], message: str):
+    """Reset a form's widgets after a successful write; the message is shown on the rerun."""
+    for key in keys:
+        st.session_state.pop(key, None)
+    st.session_state["saved_message"] = message
+    st.rerun()
+
+
+def show_saved_message():
+    if "saved_message" in st.session_state:
+        st.success(st.session_state.pop("saved_message"))
+
+
+
+def render_entry_form(entry_type: str):
+    st.header(f"{entry_type} Entry")
+    show_saved_message()
+
+    cat = entry_type
+    parties = get_parties(cat)
+    if not parties:
+        st.warning(f"No parties found for category '{cat}'. Add them in Master Data.")
+        return
+
+    items_list = get_items(cat)
+    if not items_list:
+        st.warning("No items found. Add them in Master Data.")
+        return
+
+    # Changing the item count redraws the form, so it stays outside it
+    num_items = st.number_input("Number of Items", min_value=1, step=1, value=1, key=f"{cat}_num")
+
+    # Widgets inside the form don't rerun the script until it is submitted
+    with st.form(f"{cat}_form"):
+        date_val = st.date_input("Date", datetime.now(), key=f"{cat}_date")
+        slip_no = st.text_input("Slip No.", key=f"{cat}_slip")
+        party_name = st.selectbox("Party Name", parties, key=f"{cat}_party")
+
+        # One slot per item and field (structure of arrays), filled by index
+        n = int(num_items)
+        item_types, quantities, rates = [None] * n, [0.0] * n, [0.0] * n
+        gst_flags, gst_pcts = [False] * n, [0.0] * n
+        for i in range(n):
+            st.subheader(f"Item {i + 1}")
+            item_types[i] = st.selectbox(f"Item Type {i + 1}", items_list, key=f"{cat}_it_{i}")
+            quantities[i] = st.number_input(f"Quantity {i + 1} (kg)", min_value=0.0, step=0.1, key=f"{cat}_qty_{i}")
+            rates[i] = st.number_input(f"Rate {i + 1} (per kg)", min_value=0.0, step=0.1, key=f"{cat}_rate_{i}")
+            gst_flags[i] = st.checkbox(f"Apply GST for Item {i + 1}", key=f"{cat}_gst_{i}")
+            gst_pcts[i] = st.number_input(f"GST % for Item {i + 1}", min_value=0.0, step=0.1, value=18.0,
+                                          key=f"{cat}_gstp_{i}", help="Used only when GST is applied")
+
+        submitted = st.form_submit_button(f"Add {entry_type}")
+
+    if submitted:
+        date_str = date_val.strftime("%m-%d-%Y")
+        # One vectorised pass and one rounding of the final rate, so the paise can't drift
+        rates_arr = np.array(rates)
+        adjusted_rates = np.where(
+            gst_flags, np.round(rates_arr * (1 + np.array(gst_pcts) / 100), 2), rates_arr
+        ).tolist()
+        rows = [
+            [date_str, slip_no, entry_type, party_name, t, q, r, q * r]
+            for t, q, r in zip(item_types, quantities, adjusted_rates)
+        ]
+
+        if append_rows_batch(DAYBOOK_SHEET, rows):
+            invalidate_sheet(DAYBOOK_SHEET)
+            fields = [f"{cat}_{f}_{i}" for i in range(n) for f in ("it", "qty", "rate", "gst", "gstp")]
+            clear_saved_form([f"{cat}_date", f"{cat}_slip", f"{cat}_party"] + fields,
+                             f"{entry_type} entry added successfully!")
+
+
+# ---------------------------------------------------------------------------
+# 5. Payment / Receipt Form (UPDATED with Cash/Bank Transfer)
+# ---------------------------------------------------------------------------
+
+
+def render_payment_receipt():
+    st.header("Payment / Receipt Entry")
+    show_saved_message()
+
+    # Updated mode options - now includes GST
+    # The mode decides which fields are shown, so it stays outside the forms
+    mode = st.selectbox("Mode", ["Cash", "Bank", "GST", "Bank Transfer"], key="pr_mode")
+
+    all_parties = get_all_parties()
+
+    if not all_parties:
+        st.warning("No parties found. Add them in Master Data.")
+        return
+
+    bank_parties = get_parties("Bank")
+
+    # Bank Transfer mode - special handling
+    if mode == "Bank Transfer":
+        st.subheader("Transfer between Cash/Bank accounts")
+
+        if len(bank_parties) < 2:
+            st.warning("You need at least 2 bank/cash accounts for transfers. Add them in Master Data.")
+            return
+
+        with st.form("pr_transfer_form"):
+            date_val = st.date_input("Date", datetime.now(), key="pr_date")
+            reference = st.text_input("Reference", key="pr_ref")
+            from_account = st.selectbox("From Account", bank_parties, key="pr_from_acc")
+            to_account = st.selectbox("To Account", bank_parties, index=1, key="pr_to_acc")
+            amount = st.number_input("Amount", min_value=0.0, step=0.1, key="pr_transfer_amt")
+            submitted = st.form_submit_button("Record Transfer")
+
+        if submitted:
+            # The account lists can't filter each other inside a form, so check here
+            if from_account == to_account:
+                st.error("From and To accounts must be different.")
+                return
+
+            date_str = date_val.strftime("%m-%d-%Y")
+            rows = [
+                # Debit the receiving account (Receipt)
+                [date_str, reference, "Receipt", to_account, "Bank", 0, 0, amount],
+                # Credit the sending account (Payment)
+                [date_str, reference, "Payment", from_account, "Bank", 0, 0, amount],
+            ]
+
+            if append_rows_batch(DAYBOOK_SHEET, rows):
+                invalidate_sheet(DAYBOOK_SHEET)
+                clear_saved_form(["pr_date", "pr_ref", "pr_from_acc", "pr_to_acc", "pr_transfer_amt"],
+                                 f"Transfer of ₹{amount:,.2f} from {from_account} to {to_account} recorded!")
+        return
+
+    # Resolve the contra account options for the mode before drawing the form
+    contra_options = []
+
+    if mode == "Cash":
+        # Auto-select "Cash" account and show it
+        if "Cash" in bank_parties:
+            contra_options = ["Cash"]
+        else:
+            st.warning("Cash account not found. Add 'Cash' party with category 'Bank' in Master Data.")
+            return
+
+    elif mode == "Bank":
+        contra_options = [b for b in bank_parties if b != "Cash"]
+        if not contra_options:
+            st.warning("No bank parties found. Add one in Master Data with category 'Bank'.")
+            return
+
+    elif mode == "GST":
+        # GST mode - find GST party from Payment category
+        payment_parties = get_parties("Payment")
+        contra_options = [p for p in payment_parties if "gst" in p.lower() or "Gst" in p or "GST" in p]
+        if not contra_options:
+            st.warning("No GST party found. Add 'Gst' party with category 'Payment' in Master Data.")
+            return
+
+    if len(contra_options) == 1:
+        icon = {"Cash": "💰", "GST": "📊"}.get(mode, "🏦")
+        st.info(f"{icon} Contra entry will be posted to: **{contra_options[0]}** account")
+
+    # Regular Payment/Receipt mode (including GST mode)
+    with st.form("pr_form"):
+        date_val = st.date_input("Date", datetime.now(), key="pr_date")
+        reference = st.text_input("Reference", key="pr_ref")
+        party_name = st.selectbox("Party Name", all_parties, key="pr_party")
+        voucher_type = st.selectbox("Voucher Type", ["Payment", "Receipt"], key="pr_vtype")
+        amount = st.number_input("Amount", min_value=0.0, step=0.1, key="pr_amt")
+
+        contra_account = contra_options[0]
+        if len(contra_options) > 1:
+            label = "Select GST Account" if mode == "GST" else "Bank Name"
+            key = "pr_gst_acc" if mode == "GST" else "pr_bank"
+            contra_account = st.selectbox(label, contra_options, key=key,
+                                          help="The contra entry is posted to this account")
+
+        submitted = st.form_submit_button("Add Voucher")
+
+    if submitted:
+        date_str = date_val.strftime("%m-%d-%Y")
+        rows = [
+            # Main entry
+            [date_str, reference, voucher_type, party_name, mode, 0, 0, amount]
+        ]
+
+        # Contra entry in Cash/Bank/GST account
+        if contra_account:
+            reverse = "Receipt" if voucher_type == "Payment" else "Payment"
+            rows.append([date_str, reference, reverse, contra_account, mode, 0, 0, amount])
+
+        if append_rows_batch(DAYBOOK_SHEET, rows):
+            mode_display = f"via {mode}" if mode != "GST" else "with GST adjustment"
+            invalidate_sheet(DAYBOOK_SHEET)
+            clear_saved_form(["pr_date", "pr_ref", "pr_party", "pr_vtype", "pr_amt", "pr_gst_acc", "pr_bank"],
+                             f"{voucher_type} of ₹{amount:,.2f} recorded {mode_display}!")
+
+# ---------------------------------------------------------------------------
+# 6. Party Ledger
+# ---------------------------------------------------------------------------
+
+
+def render_party_ledger():
+    st.header("Party Ledger")
+
+    all_parties = get_all_parties()
+    if not all_parties:
+        st.info("No parties found.")
+        return
+
+    party = st.selectbox("Select Party", all_parties, key="led_party")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("From", date(date.today().year, 4, 1), key="led_from")
+    with col2:
+        end_date = st.date_input("To", date.today(), key="led_to")
+
+    if st.button("Load Ledger", key="led_load"):
+        # Start with stored opening balance (only if its date <= start_date)
+        stored_bal, has_ob = get_opening_balance(party, start_date)
+        opening_balance = stored_bal
+
+        # Get the opening balance date to skip daybook entries before it
+        ob_date = get_opening_balances_map()[party][0] if has_ob else None
+
+        ledger_cols = ["Date", "Slip", "Type", "Item", "Qty", "Rate", "Debit", "Credit"]
+        # Slice the party's rows straight out of the cached Daybook frame
+        daybook = load_daybook_df()
+        if not daybook_columns_recognised(daybook):
+            return
+        rows = daybook[(daybook["Party Name"] == party) & daybook["_date"].notna()]
+
+        tx = pd.DataFrame({
+            "Date": rows["_date"],
+            "Slip": rows["Slip No."],
+            "Type": rows["Voucher Type"],
+            "Item": rows["Item"],
+            "Qty": rows["Quantity"],
+            "Rate": rows["Rate"],
+            "Amount": rows["Amount"],
+        })
+
+        # Skip transactions on or before the opening balance date
+        # (they are already included in the stored balance)
+        if ob_date:
+            tx = tx[tx["Date"] >= pd.Timestamp(ob_date)]
+
+        tx = tx.assign(
+            Debit=np.where(tx["Type"].isin(["Sale", "Payment"]), tx["Amount"], 0.0),
+            Credit=np.where(tx["Type"].isin(["Purchase", "Receipt"]), tx["Amount"], 0.0),
+        )
+
+        # Transactions between OB date and start date add to opening balance
+        before = tx["Date"] < pd.Timestamp(start_date)
+        opening_balance += tx.loc[before, "Debit"].sum() - tx.loc[before, "Credit"].sum()
+        tx = tx[~before & (tx["Date"] <= pd.Timestamp(end_date))]
+
+        # Build dataframe with opening balance row
+        if opening_balance != 0 or not tx.empty:
+            ob_dr = opening_balance if opening_balance > 0 else 0.0
+            ob_cr = abs(opening_balance) if opening_balance < 0 else 0.0
+
+            opening_row = {
+                "Date": "",
+                "Slip": "",
+                "Type": "Opening Balance",
+                "Item": "",
+                "Qty": "",
+                "Rate": "",
+                "Debit": float(ob_dr),
+                "Credit": float(ob_cr),
+            }
+
+            df = pd.DataFrame([opening_row])
+            if not tx.empty:
+                transactions_df = tx.sort_values("Date")[ledger_cols]
+                df = pd.concat([df, transactions_df]).reset_index(drop=True)
+
+            # Running balance: start from opening, then cumulative sum of net movements
+            df["Balance"] = (df["Debit"] - df["Credit"]).cumsum()
+
+            st.session_state["ledger_df"] = df
+            st.session_state["ledger_party"] = party
+            st.session_state["ledger_range"] = f"{start_date} to {end_date}"
+        else:
+            st.info("No entries found for the selected party.")
+            return
+
+    if "ledger_df" in st.session_state:
+        df = st.session_state["ledger_df"]
+        st.dataframe(df, use_container_width=True)
+
+        totals = df[["Debit", "Credit"]].sum()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Total Debit", f"{totals['Debit']:,.2f}")
+        c2.metric("Total Credit", f"{totals['Credit']:,.2f}")
+        c3.metric("Net Balance", f"{df['Balance'].iloc[-1]:,.2f}")
+
+        pdf_bytes = generate_ledger_pdf(
+            df,
+            st.session_state["ledger_party"],
+            st.session_state["ledger_range"],
+        )
+        st.download_button(
+            "Download PDF",
+            data=pdf_bytes,
+            file_name=f"Ledger_{st.session_state['ledger_party']}.pdf",
+            mime="application/pdf",
+        )
+
+
+# ---------------------------------------------------------------------------
+# 7. PDF Export
+# ---------------------------------------------------------------------------
+
+
+def generate_ledger_pdf(df: pd.DataFrame, party: str, date_range: str) -> bytes:
+    pdf = FPDF(orientation="P", unit="mm", format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(0, 10, f"Party Ledger: {party}", ln=True, align="C")
+    pdf.set_font("Helvetica", "", 10)
+    pdf.cell(0, 6, f"Period: {date_range}", ln=True, align="C")
+    pdf.ln(4)
+
+    cols = list(df.columns)
+    col_widths = {
+        "Date": 28,
+        "Slip": 16,
+        "Type": 20,
+        "Item": 20,
+        "Qty": 20,
+        "Rate": 18,
+        "Debit": 22,
+        "Credit": 22,
+        "Balance": 26,
+    }
+
+    # Numeric columns by name: Qty/Rate arrive as object dtype (the opening row
+    # leaves them blank), so their dtype can't be used to pick the format
+    numeric_cols = {"Qty", "Rate", "Debit", "Credit", "Balance"}
+    col_w = tuple(col_widths.get(c, 25) for c in cols)
+    aligns = tuple("RIGHT" if c in numeric_cols else "LEFT" for c in cols)
+
+    # Format every cell up front so the table only receives strings
+    body = df.astype(str)
+    for c in numeric_cols.intersection(cols):
+        nums = pd.to_numeric(df[c], errors="coerce")
+        body[c] = body[c].where(nums.isna(), nums.map("{:,.2f}".format))
+
+    totals = {
+        "Date": "TOTAL",
+        "Debit": f"{df['Debit'].sum():,.2f}",
+        "Credit": f"{df['Credit'].sum():,.2f}",
+        "Balance": f"{df['Balance'].iloc[-1]:,.2f}",
+    }
+    bold = FontFace(emphasis="BOLD", size_pt=9)
+
+    pdf.set_font("Helvetica", "", 8)
+    with pdf.table(
+        col_widths=col_w,
+        text_align=aligns,
+        line_height=6,
+        headings_style=bold,
+    ) as table:
+        header = table.row()
+        for c in cols:
+            header.cell(c, align="CENTER")
+
+        for values in body.itertuples(index=False, name=None):
+            table.row(values)
+
+        total_row = table.row()
+        for c in cols:
+            align = "CENTER" if c == "Date" else None
+            total_row.cell(totals.get(c, ""), align=align, style=bold)
+
+    return bytes(pdf.output())
+
+
+# ---------------------------------------------------------------------------
+# 8. Dashboard
+# ---------------------------------------------------------------------------
+
+
+def render_dashboard():
+    st.header("Dashboard")
+
+    df = load_daybook_df()
+    if df.empty:
+        st.info("No data in Daybook yet.")
+        return
+    if not daybook_columns_recognised(df):
+        return
+
+    st.subheader("Outstanding Balances")
+    balances = calculate_all_party_balances()
+    balances = balances[balances.abs() > 0.01]
+
+    if not balances.empty:
+        summary_df = (
+            balances.rename("Balance")
+            .rename_axis("Party")
+            .reset_index()
+            .sort_values("Balance", ascending=False)
+        )
+        st.dataframe(summary_df, use_container_width=True)
+    else:
+        st.info("No outstanding balances.")
+
+
+# ---------------------------------------------------------------------------
+# 9. Master Data Management
+# ---------------------------------------------------------------------------
+
+
+def render_master_data():
+    st.header("Master Data")
+
+    # Seeding costs several API calls, so only pay for it on this page
+    seed_master_data()
+
+    tab1, tab2, tab3 = st.tabs(["Parties", "Items", "Opening Balances"])
+
+    with tab1:
+        _master_data_tab(PARTIES_SHEET, "Party", ["Name", "Category"],
+                         category_options=["Purchase", "Sale", "Payment", "Bank"])
+
+    with tab2:
+        _master_data_tab(ITEMS_SHEET, "Item", ["Name", "Category"],
+                         category_options=["Purchase", "Sale"])
+
+    with tab3:
+        _opening_balances_tab()
+
+
+def _master_data_tab(sheet_name: str, label: str, headers: list[str], category_options: list[str]):
+    all_vals = read_all_values(sheet_name)
+
+    if len(all_vals) <= 1:
+        st.info(f"No {label.lower()}s found.")
+        data_rows = []
+    else:
+        data_rows = all_vals[1:]
+
+    if data_rows:
+        st.subheader(f"Existing {label}s")
+        for idx, row in enumerate(data_rows):
+            name = row[0] if len(row) > 0 else ""
+            cols = st.columns([3, 2, 1, 1])
+            cols[0].write(name)
+            cols[1].write(row[1] if len(row) > 1 else "")
+
+            if cols[2].button("Edit", key=f"{sheet_name}_edit_{idx}"):
+                st.session_state[f"{sheet_name}_editing"] = row
+
+            if cols[3].button("Del", key=f"{sheet_name}_del_{idx}"):
+                # The grid is cached; resolve the row live in case the sheet changed since
+                row_num = find_row(sheet_name, name)
+                if not row_num:
+                    st.warning(f"{label} '{name}' is no longer in the sheet.")
+                    invalidate_sheet(sheet_name)
+                elif delete_row(sheet_name, row_num):
+                    st.success(f"{label} deleted.")
+                    invalidate_sheet(sheet_name)
+                    st.rerun()
+
+    editing_key = f"{sheet_name}_editing"
+    if editing_key in st.session_state:
+        # The row as shown when Edit was pressed; its sheet row is looked up on Save
+        current = st.session_state[editing_key]
+        old_name = current[0] if len(current) > 0 else ""
+        st.subheader(f"Edit {label}")
+
+        new_name = st.text_input("Name", value=old_name, key=f"{sheet_name}_ename")
+
+        cat_idx = category_options.index(current[1]) if len(current) > 1 and current[1] in category_options else 0
+        new_cat = st.selectbox("Category", category_options, index=cat_idx, key=f"{sheet_name}_ecat")
+
+        c1, c2 = st.columns(2)
+        if c1.button("Save", key=f"{sheet_name}_esave"):
+            row_num = find_row(sheet_name, old_name)
+            if not row_num:
+                st.warning(f"{label} '{old_name}' is no longer in the sheet.")
+                invalidate_sheet(sheet_name)
+            elif update_rows_batch(sheet_name, {row_num: [new_name, new_cat]}, value_input_option="RAW"):
+                st.success(f"{label} updated.")
+                del st.session_state[editing_key]
+                invalidate_sheet(sheet_name)
+                st.rerun()
+
+        if c2.button("Cancel", key=f"{sheet_name}_ecancel"):
+            del st.session_state[editing_key]
+            st.rerun()
+
+    st.subheader(f"Add {label}")
+    new_name = st.text_input(f"New {label} Name", key=f"{sheet_name}_new_name")
+    new_cat = st.selectbox(f"{label} Category", category_options, key=f"{sheet_name}_new_cat")
+
+    if st.button(f"Add {label}", key=f"{sheet_name}_add"):
+        if new_name.strip():
+            if append_row(sheet_name, [new_name.strip(), new_cat], value_input_option="RAW"):
+                st.success(f"{label} '{new_name.strip()}' added.")
+                invalidate_sheet(sheet_name)
+                st.rerun()
+        else:
+            st.warning("Name cannot be empty.")
+
+
+def _opening_balances_tab():
+    """Manage opening balances per party in a separate sheet."""
+    data_rows, existing = opening_balance_index()
+
+    # Show existing opening balances
+    if data_rows:
+        st.subheader("Current Opening Balances")
+        display = (
+            pd.DataFrame(data_rows)
+            .reindex(columns=["Party Name", "Date", "Debit", "Credit"])
+            .fillna("")
+        )
+        display[["Debit", "Credit"]] = (
+            display[["Debit", "Credit"]].apply(pd.to_numeric, errors="coerce").fillna(0.0)
+        )
+        bal = display["Debit"] - display["Credit"]
+        display["Balance"] = bal.abs().map("{:,.2f}".format) + np.where(bal >= 0, " Dr", " Cr")
+        st.dataframe(display, use_container_width=True)
+
+    # Edit / Add opening balance
+    st.subheader("Set Opening Balance")
+    all_parties = get_all_parties()
+    if not all_parties:
+        st.info("No parties found. Add parties first.")
+        return
+
+    party = st.selectbox("Party", all_parties, key="ob_party")
+
+    # Pre-fill if party already has an opening balance
+    prefill_date = date(date.today().year, 4, 1)
+    prefill_dr, prefill_cr = 0.0, 0.0
+
+    if party in existing:
+        row = existing[party]
+        prefill_date = _parse_mdy(row.get("Date", "")) or prefill_date
+        prefill_dr = float(row.get("Debit", 0) or 0)
+        prefill_cr = float(row.get("Credit", 0) or 0)
+
+    ob_date = st.date_input("Balance as on date", value=prefill_date, key="ob_date",
+                            help="Transactions before this date are assumed included in this balance")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        debit = st.number_input("Debit (they owe you)", min_value=0.0, step=0.1, value=prefill_dr, key="ob_dr")
+    with col2:
+        credit = st.number_input("Credit (you owe them)", min_value=0.0, step=0.1, value=prefill_cr, key="ob_cr")
+
+    if st.button("Save Opening Balance", key="ob_save"):
+        date_str = ob_date.strftime("%m-%d-%Y")
+
+        # Resolve the row live; the cached index may predate another user's edit
+        row_num = find_row(OPENING_BAL_SHEET, party)
+        if row_num:
+            if update_row(OPENING_BAL_SHEET, row_num, [party, date_str, debit, credit]):
+                st.success(f"Opening balance updated for {party} as on {ob_date}.")
+                invalidate_sheet(OPENING_BAL_SHEET)
+                st.rerun()
+        else:
+            if append_row(OPENING_BAL_SHEET, [party, date_str, debit, credit]):
+                st.success(f"Opening balance saved for {party} as on {ob_date}.")
+                invalidate_sheet(OPENING_BAL_SHEET)
+                st.rerun()
+
+    # Delete option
+    if data_rows:
+        st.subheader("Remove Opening Balance")
+        del_party = st.selectbox("Select party to remove", list(existing.keys()), key="ob_del_party")
+        if st.button("Remove", key="ob_del"):
+            row_num = find_row(OPENING_BAL_SHEET, del_party)
+            if not row_num:
+                st.warning(f"No opening balance found for {del_party}.")
+                invalidate_sheet(OPENING_BAL_SHEET)
+            elif delete_row(OPENING_BAL_SHEET, row_num):
+                st.success(f"Opening balance removed for {del_party}.")
+                invalidate_sheet(OPENING_BAL_SHEET)
+                st.rerun()
+
+
+# ---------------------------------------------------------------------------
+# 10. Main App
+# ---------------------------------------------------------------------------
+
+
+# Sidebar label -> page renderer, in menu order
+PAGES = {
+    "Dashboard": render_dashboard,
+    "Purchase Entry": lambda: render_entry_form("Purchase"),
+    "Sale Entry": lambda: render_entry_form("Sale"),
+    "Payment/Receipt Entry": render_payment_receipt,
+    "Party Ledger": render_party_ledger,
+    "Master Data": render_master_data,
+}
+
+
+def _prefetch_daybook():
+    """Warm the shared Daybook/OB cache; failures are left for the page that needs the data."""
+    try:
+        read_daybook_and_ob()
+    except Exception:
+        pass
+
+
+def main():
+    st.set_page_config(page_title="ERP Data Entry", layout="wide")
+
+    # Fetch the Daybook in the background while the user picks a page. Pages that
+    # need it wait on Streamlit's per-key cache lock instead of fetching twice.
+    if not st.session_state.get("prefetch"):
+        st.session_state["prefetch"] = True
+        thread = threading.Thread(target=_prefetch_daybook, daemon=True)
+        thread.start()
+
+    st.sidebar.title("Menu")
+    menu = st.sidebar.radio("Select Page", list(PAGES))
+    try:
+        PAGES[menu]()
+    except SheetReadError as e:
+        st.error(f"{e}. Nothing was cached; reload the page to try again.")
+
+
+if __name__ == "__main__":
+    main()
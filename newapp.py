@@ -1,84 +1,260 @@
-import streamlit as st
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import json
-
-# --- Google Sheets authentication using st.secrets ---
-def authenticate_google_sheet():
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-
-    # Load credentials from st.secrets
-    creds_dict = st.secrets["gcp_service_account"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    client = gspread.authorize(creds)
-    return client
-
-def append_to_sheet(sheet_id, sheet_name, data):
-    client = authenticate_google_sheet()
-    workbook = client.open_by_key(sheet_id)  # Open workbook by Spreadsheet ID
-    sheet = workbook.worksheet(sheet_name)  # Access the specified sheet
-    sheet.append_row(data, value_input_option="USER_ENTERED")
-
-# --- Streamlit App ---
-st.title("")
-st.sidebar.header("Input Details")
-
-# Sale Items
-sale_items = [
-    "Ap25", "Ap50", "Ap5", "1800n", "Rbc", "Ap84", "L10", "L10dbp", 
-    "L20", "101n", "L2", "12dbp", "212n", "220n", "C3", "20n", "J20", 
-    "5dop", "2n", "6n", "P94", "P90", "P02", "P23", "Dt94", "18n", "25s", "P01", "D2", "D5"
-]
-
-# Inputs
-input_date = st.sidebar.date_input("Date")
-formatted_date = input_date.strftime("%m-%d-%Y")
-
-grade = st.sidebar.selectbox("Grade", sale_items)
-num_lots = st.sidebar.number_input("Number of Lots", min_value=1, step=1)
-
-st.sidebar.subheader("Raw Material Quantities Per Lot")
-resin_qty = st.sidebar.number_input("Resin Quantity in Kg", min_value=0.0, step=0.1)
-mitti_qty = st.sidebar.number_input("Mitti Quantity in Kg", min_value=0.0, step=0.1)
-cpw_qty = st.sidebar.number_input("CPW Quantity in Kg", min_value=0.0, step=0.1)
-dop_qty = st.sidebar.number_input("Dop/Dbp Quantity in Kg", min_value=0.0, step=0.1)
-chemical_qty = st.sidebar.number_input("Chemical Quantity in Kg", min_value=0.0, step=0.1)
-other_qty = st.sidebar.number_input("Other Quantity in Kg", min_value=0.0, step=0.1)
-
-output_weight = st.sidebar.number_input("Output Weight", min_value=0.0, step=0.1)
-
-# Lot weight calculation
-lot_weight = num_lots * (resin_qty + mitti_qty + cpw_qty + chemical_qty + dop_qty) + other_qty
-
-# Display
-st.subheader("Summary")
-st.write(f"Date: {input_date}")
-st.write(f"Grade: {grade}")
-st.write(f"Number of Lots: {num_lots}")
-st.write(f"Lot Weight: {lot_weight} Kg")
-st.write(f"Output Weight: {output_weight} Kg")
-
-# Spreadsheet ID and Sheet Name from secrets
-sheet_id = st.secrets["sheets"]["sheet_id"]
-sheet_name = "production"
-
-# Save Data Button
-if st.button("Save Data"):
-    row_data = [
-        formatted_date, grade, num_lots,
-        resin_qty * num_lots,
-        mitti_qty * num_lots,
-        cpw_qty * num_lots,
-        dop_qty * num_lots,
-        chemical_qty * num_lots,
-        other_qty,
-        lot_weight,
-        output_weight
-    ]
-    try:
-        append_to_sheet(sheet_id, sheet_name, row_data)
-        st.success(f"Data saved successfully to {sheet_name} in the specified workbook!")
-    except Exception as e:
-        st.error(f"An error occurred: {e}")
-
-st.info("Double check the quantities before saving.")
+import streamlit as st
+import gspread
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# --- Google Sheets authentication using st.secrets ---
+# Cached per process, so reruns and other users reuse the same client and handles;
+# the private key is parsed once, when the client is first built
+@st.cache_resource(show_spinner=False)
+def _get_client():
+    # google-auth credentials with gspread's default scopes and a pooled requests session
+    return gspread.service_account_from_dict(st.secrets["gcp_service_account"])
+
+@st.cache_resource(show_spinner=False)
+def _get_worksheet(sheet_id, sheet_name):
+    workbook = _get_client().open_by_key(sheet_id)  # Open workbook by Spreadsheet ID
+    return workbook.worksheet(sheet_name)  # Access the specified sheet
+
+# --- Background writer ---
+# Save buttons only record rows in a local SQLite buffer; one daemon thread per
+# process syncs them to Sheets in batched append_rows calls, backing off on 429/5xx.
+# Rows leave the buffer only once written, so they survive errors and restarts;
+# rows Sheets rejects outright are kept but marked failed instead of retried.
+# Anchored next to this script so the buffer doesn't move with the launch directory.
+PENDING_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pending_writes.db")
+WRITE_BATCH_SIZE = 50
+WRITE_BATCH_WAIT = 2  # seconds to wait for more rows before flushing
+WRITE_RETRY_INTERVAL = 30  # seconds between sync attempts for rows left behind
+WRITE_MAX_ATTEMPTS = 6
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class _TokenBucket:
+    """Allow `rate` requests per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, tokens=1):
+        """Block until `tokens` are available, then take them."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Sheets allows ~60 write requests per minute per user; shape bursts below that
+_bucket = _TokenBucket(rate=1.0, capacity=10)
+
+def append_to_sheet(sheet_id, sheet_name, rows):
+    for attempt in range(WRITE_MAX_ATTEMPTS):
+        try:
+            sheet = _get_worksheet(sheet_id, sheet_name)
+            _bucket.consume()
+            sheet.append_rows(rows, value_input_option="USER_ENTERED", insert_data_option="INSERT_ROWS")
+            return
+        except gspread.exceptions.APIError as e:
+            status = e.response.status_code
+            if status not in RETRY_STATUSES or attempt == WRITE_MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(min(2 ** attempt, 60))
+
+class _PendingStore:
+    """Rows waiting to be synced to Sheets, kept in SQLite and shared across threads."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, sheet_id TEXT, sheet_name TEXT, payload TEXT, error TEXT)"
+        )
+        # Buffers created before rows could be marked failed lack the error column
+        columns = {info[1] for info in self.conn.execute("PRAGMA table_info(pending)")}
+        if "error" not in columns:
+            self.conn.execute("ALTER TABLE pending ADD COLUMN error TEXT")
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.last_error = None  # most recent transient sync failure, cleared on success
+
+    def add(self, sheet_id, sheet_name, row):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO pending (sheet_id, sheet_name, payload) VALUES (?, ?, ?)",
+                (sheet_id, sheet_name, json.dumps(row)),
+            )
+            self.conn.commit()
+        self.wake.set()
+
+    def take(self, limit):
+        """Oldest rows still to sync as (id, sheet_id, sheet_name, row); they stay until removed."""
+        with self.lock:
+            cur = self.conn.execute(
+                "SELECT id, sheet_id, sheet_name, payload FROM pending WHERE error IS NULL ORDER BY id LIMIT ?",
+                (limit,),
+            )
+            return [(row_id, sheet_id, sheet_name, json.loads(payload)) for row_id, sheet_id, sheet_name, payload in cur]
+
+    def remove(self, ids):
+        with self.lock:
+            self.conn.executemany("DELETE FROM pending WHERE id = ?", [(row_id,) for row_id in ids])
+            self.conn.commit()
+
+    def mark_failed(self, ids, error):
+        """Keep rows Sheets will never accept, but stop retrying them."""
+        with self.lock:
+            self.conn.executemany("UPDATE pending SET error = ? WHERE id = ?", [(error, row_id) for row_id in ids])
+            self.conn.commit()
+
+    def status(self):
+        """(rows waiting to sync, rows marked failed, latest failure message or None)."""
+        with self.lock:
+            waiting, failed = self.conn.execute(
+                "SELECT COUNT(*) - COUNT(error), COUNT(error) FROM pending"
+            ).fetchone()
+            latest = self.conn.execute(
+                "SELECT error FROM pending WHERE error IS NOT NULL ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        return waiting, failed, latest[0] if latest else None
+
+def _is_permanent(error):
+    """Errors retrying can't fix: bad sheet id or tab, permissions, malformed request."""
+    if isinstance(error, (gspread.exceptions.SpreadsheetNotFound, gspread.exceptions.WorksheetNotFound)):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.response.status_code not in RETRY_STATUSES
+    return False
+
+def _flush_pending(store):
+    """Write out everything pending; stop at the first failed batch so it is retried later."""
+    while True:
+        pending = store.take(WRITE_BATCH_SIZE)
+        if not pending:
+            return
+        batches = {}
+        for row_id, sheet_id, sheet_name, row in pending:
+            ids, rows = batches.setdefault((sheet_id, sheet_name), ([], []))
+            ids.append(row_id)
+            rows.append(row)
+
+        for (sheet_id, sheet_name), (ids, rows) in batches.items():
+            try:
+                append_to_sheet(sheet_id, sheet_name, rows)
+            except Exception as e:
+                message = f"{sheet_name}: {e}"
+                if _is_permanent(e):
+                    logging.exception("Sheets rejected %d row(s) for %s; not retrying", len(rows), sheet_name)
+                    store.mark_failed(ids, message)
+                    continue
+                logging.exception("Failed to write %d row(s) to %s; will retry", len(rows), sheet_name)
+                store.last_error = message
+                return
+            store.remove(ids)
+            store.last_error = None
+
+def _writer_loop(store):
+    while True:
+        # Woken by a save, or periodically to retry rows left from a failure or restart
+        store.wake.wait(timeout=WRITE_RETRY_INTERVAL)
+        store.wake.clear()
+        time.sleep(WRITE_BATCH_WAIT)  # let a burst of saves accumulate
+        _flush_pending(store)
+
+@st.cache_resource(show_spinner=False)
+def _get_pending_store():
+    store = _PendingStore(PENDING_DB)
+    threading.Thread(target=_writer_loop, args=(store,), daemon=True, name="sheets-writer").start()
+    return store
+
+# --- Streamlit App ---
+st.title("")
+st.sidebar.header("Input Details")
+
+# Sale Items
+sale_items = (
+    "Ap25", "Ap50", "Ap5", "1800n", "Rbc", "Ap84", "L10", "L10dbp", 
+    "L20", "101n", "L2", "12dbp", "212n", "220n", "C3", "20n", "J20", 
+    "5dop", "2n", "6n", "P94", "P90", "P02", "P23", "Dt94", "18n", "25s", "P01", "D2", "D5"
+)
+
+# Inputs
+# Batched in a form: editing a field doesn't rerun the script until one of its
+# buttons is pressed. Save is a submit button of the same form, so it always
+# writes the values currently in the fields, never an older summary.
+with st.sidebar.form("production_form"):
+    input_date = st.date_input("Date")
+    formatted_date = input_date.strftime("%m-%d-%Y")
+
+    grade = st.selectbox("Grade", sale_items)
+    num_lots = st.number_input("Number of Lots", min_value=1, step=1)
+
+    st.subheader("Raw Material Quantities Per Lot")
+    resin_qty = st.number_input("Resin Quantity in Kg", min_value=0.0, step=0.1)
+    mitti_qty = st.number_input("Mitti Quantity in Kg", min_value=0.0, step=0.1)
+    cpw_qty = st.number_input("CPW Quantity in Kg", min_value=0.0, step=0.1)
+    dop_qty = st.number_input("Dop/Dbp Quantity in Kg", min_value=0.0, step=0.1)
+    chemical_qty = st.number_input("Chemical Quantity in Kg", min_value=0.0, step=0.1)
+    other_qty = st.number_input("Other Quantity in Kg", min_value=0.0, step=0.1)
+
+    output_weight = st.number_input("Output Weight", min_value=0.0, step=0.1)
+
+    st.form_submit_button("Update Summary")
+    save_clicked = st.form_submit_button("Save Data")
+
+# Lot weight calculation
+lot_weight = num_lots * (resin_qty + mitti_qty + cpw_qty + chemical_qty + dop_qty) + other_qty
+
+# Display
+st.subheader("Summary")
+st.write(f"Date: {input_date}")
+st.write(f"Grade: {grade}")
+st.write(f"Number of Lots: {num_lots}")
+st.write(f"Lot Weight: {lot_weight} Kg")
+st.write(f"Output Weight: {output_weight} Kg")
+
+# Spreadsheet ID and Sheet Name from secrets
+sheet_id = st.secrets["sheets"]["sheet_id"]
+sheet_name = "production"
+
+# Save Data Button
+if save_clicked:
+    row_data = [
+        formatted_date, grade, num_lots,
+        resin_qty * num_lots,
+        mitti_qty * num_lots,
+        cpw_qty * num_lots,
+        dop_qty * num_lots,
+        chemical_qty * num_lots,
+        other_qty,
+        lot_weight,
+        output_weight
+    ]
+    _get_pending_store().add(sheet_id, sheet_name, row_data)
+    st.success(f"Data saved locally; it will sync to {sheet_name} in the workbook within a few seconds.")
+
+# Sync status, so a failing or stuck background write is visible
+waiting, failed, failure = _get_pending_store().status()
+if waiting:
+    st.caption(f"{waiting} row(s) waiting to sync to Google Sheets.")
+if _get_pending_store().last_error:
+    st.warning(f"Last sync attempt failed and will be retried: {_get_pending_store().last_error}")
+if failed:
+    st.error(
+        f"{failed} row(s) were rejected by Google Sheets and will not be retried "
+        f"(latest: {failure}). They are kept in {PENDING_DB}."
+    )
+
+st.info("Double check the quantities in the summary before saving.")